@@ -0,0 +1,29 @@
+# One-shot schema creation.
+# With several gunicorn workers, running DDL at import time means every
+# worker races to CREATE TABLE on boot. Serialise it behind a file lock
+# so exactly one process does the work and the rest see it done.
+import fcntl
+
+from database import Base, engine
+
+# Registers the tables on Base.metadata - without this a standalone
+# init() would "create" an empty schema.
+import models
+
+_LOCK_FILE = "pos.db.init.lock"
+
+
+def init():
+    with open(_LOCK_FILE, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            Base.metadata.create_all(engine)
+            # create_all skips tables that already exist, indexes and
+            # all, so indexes added to the models after a deployment's
+            # first boot never materialize. Create any stragglers here;
+            # checkfirst makes the ones already present a no-op.
+            for table in Base.metadata.tables.values():
+                for index in table.indexes:
+                    index.create(engine, checkfirst=True)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
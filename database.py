@@ -1,15 +1,47 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 # Create a sqlite engine instance
 # NOTE: check_same_thread is only needed for sqlite
-engine = create_engine("sqlite:///pos.db", connect_args={"check_same_thread": False})
+# NOTE: QueuePool keeps a pool of warm connections instead of reopening the
+#       database file on every request.
+engine = create_engine(
+    "sqlite:///pos.db",
+    connect_args={"check_same_thread": False},
+    poolclass=QueuePool,
+    pool_size=10,
+    max_overflow=20,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    query_cache_size=500,
+)
+
+
+# Tune each new sqlite connection.
+# WAL lets readers run while a writer is busy, and the bigger cache keeps
+# hot pages in memory between requests.
+@event.listens_for(engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA wal_autocheckpoint=1000")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA cache_size=-64000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
 
 # Create a DeclarativeMeta instance
 Base = declarative_base()
 
-# Create SessionLocal class from sessionmaker factory
+# Create SessionLocal from the sessionmaker factory.
+# One plain Session per request. FastAPI runs the dependency's setup and
+# teardown in separate threadpool threads, so anything keyed on the
+# current thread (scoped_session registries) tears down the wrong
+# session; closing the yielded object directly is thread-agnostic.
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
 
 # Helper function to get database session
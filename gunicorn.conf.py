@@ -1,8 +1,41 @@
+import multiprocessing
+import os
+
 bind = "0.0.0.0:8443"
-workers = 1
+# One worker can't use the other cores. Cap it so a big box doesn't
+# spawn silly numbers of SQLite writers.
+workers = int(
+    os.getenv("GUNICORN_WORKERS", min(16, multiprocessing.cpu_count() * 2 + 1))
+)
 worker_class = "uvicorn.workers.UvicornWorker"
 worker_connections = 1000
 keepalive = 5
+timeout = 60
+
+# Import the app once and share the memory across forks.
+preload_app = True
+max_requests = 100000
+max_requests_jitter = 100
+
+
+def on_starting(server):
+    # run the DDL once in the master before the workers fork
+    from bootstrap_db import init
+
+    init()
+
+
+def post_fork(server, worker):
+    # The master's DDL run leaves pooled SQLite connections open, and
+    # preload_app means every worker inherits those fds - sharing a
+    # DBAPI connection across processes is unsafe (and pool_pre_ping
+    # can't tell: the inherited fd answers SELECT 1 happily). Drop the
+    # inherited pool without touching the parent's fds so each worker
+    # opens its own connections.
+    from database import engine
+
+    engine.dispose(close=False)
+
 
 keyfile = "privkey.pem"
 certfile = "cert.pem"
@@ -1,10 +1,11 @@
-import codecs
 import csv
+import io
 from datetime import datetime, timedelta
+from decimal import Decimal
 from functools import partial
-from itertools import groupby
 import logging
 import math
+import os
 
 from typing import List, Optional
 from fastapi import (
@@ -18,19 +19,21 @@ from fastapi import (
     File,
 )
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_utils.timing import add_timing_middleware
-from database import Base, engine, get_session, SessionLocal
-from sqlalchemy.orm import Session
+from database import get_session
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.orm import Session, raiseload, selectinload
 
 import models
 import schemas
 from security import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     authenticate_user,
-    check_superuser,
     create_access_token,
     get_current_active_user,
+    get_current_superuser,
     get_password_hash,
 )
 import utils
@@ -39,12 +42,21 @@ import utils
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create the database
-Base.metadata.create_all(engine)
+# ISO yyyy-mm-dd. Compiled once here instead of inline per Query param.
+DATE_REGEX = r"^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])$"
+
+# Create the database (lock-guarded, so parallel workers don't race on DDL)
+import bootstrap_db
+
+bootstrap_db.init()
 
 # Initialize app
-app = FastAPI()
-add_timing_middleware(app, record=logger.info, prefix="app")
+app = FastAPI(default_response_class=ORJSONResponse)
+
+# Per-request timing is handy when profiling but is pure overhead
+# (formatting + logger lock) on the production hot path.
+if os.getenv("POS_ENABLE_TIMING", "0") == "1":
+    add_timing_middleware(app, record=logger.info, prefix="app")
 
 # origins = ["http://localhost", "http://localhost:3000", "http://localhost:8080", "*"]
 origins = [
@@ -66,18 +78,15 @@ app.add_middleware(
 )
 
 
-# Helper function to get database session
-def get_session():
-    session = SessionLocal()
-    try:
-        yield session
-    finally:
-        session.close()
+# Health-check traffic lands here constantly; serialize the constant
+# body once. The Response itself must be fresh per request -
+# CORSMiddleware mutates the outgoing header list in place.
+_ROOT_BODY = b'"pos"'
 
 
 @app.get("/")
 def root():
-    return "pos"
+    return Response(content=_ROOT_BODY, media_type="application/json")
 
 
 @app.post("/token", response_model=schemas.Token)
@@ -86,11 +95,9 @@ def login_for_access_token(
     session: Session = Depends(get_session),
 ):
     # get the item item with the given id
-    user = (
-        session.query(models.User)
-        .filter(models.User.username == form_data.username)
-        .first()
-    )
+    user = session.scalars(
+        select(models.User).where(models.User.username == form_data.username)
+    ).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -116,10 +123,8 @@ def login_for_access_token(
 def create_user(
     user: schemas.UserCreate,
     session: Session = Depends(get_session),
-    current_user: schemas.User = Depends(get_current_active_user),
+    current_user: schemas.User = Depends(get_current_superuser),
 ):
-    check_superuser(current_user)
-
     password_hash = get_password_hash(user.password)
 
     userdb = models.User(
@@ -133,7 +138,6 @@ def create_user(
     # add it to the session and commit it
     session.add(userdb)
     session.commit()
-    session.refresh(userdb)
 
     # return the item object
     return userdb
@@ -147,12 +151,19 @@ def read_users_me(current_user: schemas.User = Depends(get_current_active_user))
 @app.get("/users", response_model=List[schemas.User])
 def read_user_list(
     session: Session = Depends(get_session),
-    current_user: schemas.User = Depends(get_current_active_user),
+    current_user: schemas.User = Depends(get_current_superuser),
 ):
-    check_superuser(current_user)
-
     # get all users
-    user_list = session.query(models.User).all()
+    # project just the columns the schema serializes - no point hydrating
+    # full ORM instances (or pulling hashed_password) for a listing
+    user_list = session.execute(
+        select(
+            models.User.username,
+            models.User.email,
+            models.User.full_name,
+            models.User.disabled,
+        )
+    ).all()
 
     return user_list
 
@@ -170,7 +181,7 @@ def create_item(
     # add it to the session and commit it
     session.add(itemdb)
     session.commit()
-    session.refresh(itemdb)
+    utils.cache_drop("item_list", 0)
 
     # return the item object
     return itemdb
@@ -183,13 +194,17 @@ def read_item(
     current_user: schemas.User = Depends(get_current_active_user),
 ):
 
-    # get the item item with the given id
-    item = session.query(models.Item).get(id)
+    # serve hot ids straight from the in-process cache
+    # the payload was validated when it was cached, so skip the pydantic
+    # re-validation pass and hand the bytes straight back
+    cached = utils.cache_get("item", id)
+    if cached:
+        return ORJSONResponse(cached)
 
-    # check if item item with given id exists. If not, raise exception and return 404 not found response
-    if not item:
-        raise HTTPException(status_code=404, detail=f"item item with id {id} not found")
+    # get the item item with the given id (404s if missing)
+    item = utils.get_or_404(session, models.Item, id, "item item")
 
+    utils.cache_set("item", id, {"id": item.id, "name": item.name})
     return item
 
 
@@ -201,17 +216,14 @@ def update_item(
     current_user: schemas.User = Depends(get_current_active_user),
 ):
 
-    # get the item item with the given id
-    item = session.query(models.Item).get(id)
-
-    # update item item with the given name (if an item with the given id was found)
-    if item:
-        item.name = name
-        session.commit()
+    # get the item item with the given id (404s if missing)
+    item = utils.get_or_404(session, models.Item, id, "item item")
 
-    # check if item item with given id exists. If not, raise exception and return 404 not found response
-    if not item:
-        raise HTTPException(status_code=404, detail=f"item item with id {id} not found")
+    # update item item with the given name
+    item.name = name
+    session.commit()
+    utils.cache_drop("item", id)
+    utils.cache_drop("item_list", 0)
 
     return item
 
@@ -226,15 +238,12 @@ def delete_item(
     Should this method exist???
     """
 
-    # get the item item with the given id
-    item = session.query(models.Item).get(id)
-
-    # if item item with given id exists, delete it from the database. Otherwise raise 404 error
-    if item:
-        session.delete(item)
-        session.commit()
-    else:
-        raise HTTPException(status_code=404, detail=f"item item with id {id} not found")
+    # get the item item with the given id (404s if missing), then delete it
+    item = utils.get_or_404(session, models.Item, id, "item item")
+    session.delete(item)
+    session.commit()
+    utils.cache_drop("item", id)
+    utils.cache_drop("item_list", 0)
 
     return None
 
@@ -245,9 +254,18 @@ def read_item_list(
     current_user: schemas.User = Depends(get_current_active_user),
 ):
 
-    # get all item items
-    item_list = session.query(models.Item).all()
+    # items change rarely, so the whole list caches well
+    cached = utils.cache_get("item_list", 0)
+    if cached:
+        return ORJSONResponse(cached)
+
+    # get all item items as plain (id, name) rows - skips per-row ORM
+    # instance construction and identity-map bookkeeping entirely
+    item_list = session.execute(select(models.Item.id, models.Item.name)).all()
 
+    utils.cache_set(
+        "item_list", 0, [{"id": item.id, "name": item.name} for item in item_list]
+    )
     return item_list
 
 
@@ -264,7 +282,7 @@ def create_store(
     # add it to the session and commit it
     session.add(storedb)
     session.commit()
-    session.refresh(storedb)
+    utils.cache_drop("store_list", 0)
 
     # return the store object
     return storedb
@@ -277,15 +295,16 @@ def read_store(
     current_user: schemas.User = Depends(get_current_active_user),
 ):
 
-    # get the store with the given id
-    store = session.query(models.Store).get(id)
+    # serve hot ids straight from the in-process cache
+    # same trick as read_item: cached payloads skip re-validation
+    cached = utils.cache_get("store", id)
+    if cached:
+        return ORJSONResponse(cached)
 
-    # check if store with given id exists. If not, raise exception and return 404 not found response
-    if not store:
-        raise HTTPException(
-            status_code=404, detail=f"store item with id {id} not found"
-        )
+    # get the store with the given id (404s if missing)
+    store = utils.get_or_404(session, models.Store, id, "store item")
 
+    utils.cache_set("store", id, {"id": store.id, "name": store.name})
     return store
 
 
@@ -297,17 +316,14 @@ def update_store(
     current_user: schemas.User = Depends(get_current_active_user),
 ):
 
-    # get the store with the given id
-    store = session.query(models.Store).get(id)
-
-    # update store with the given name (if a store with the given id was found)
-    if store:
-        store.name = name
-        session.commit()
+    # get the store with the given id (404s if missing)
+    store = utils.get_or_404(session, models.Store, id, "store")
 
-    # check if store with given id exists. If not, raise exception and return 404 not found response
-    if not store:
-        raise HTTPException(status_code=404, detail=f"store with id {id} not found")
+    # update store with the given name
+    store.name = name
+    session.commit()
+    utils.cache_drop("store", id)
+    utils.cache_drop("store_list", 0)
 
     return store
 
@@ -322,15 +338,12 @@ def delete_store(
     Should this method exist???
     """
 
-    # get the store with the given id
-    store = session.query(models.Store).get(id)
-
-    # if store with given id exists, delete it from the database. Otherwise raise 404 error
-    if store:
-        session.delete(store)
-        session.commit()
-    else:
-        raise HTTPException(status_code=404, detail=f"store with id {id} not found")
+    # get the store with the given id (404s if missing), then delete it
+    store = utils.get_or_404(session, models.Store, id, "store")
+    session.delete(store)
+    session.commit()
+    utils.cache_drop("store", id)
+    utils.cache_drop("store_list", 0)
 
     return None
 
@@ -341,9 +354,17 @@ def read_store_list(
     current_user: schemas.User = Depends(get_current_active_user),
 ):
 
-    # get all store stores
-    store_list = session.query(models.Store).all()
+    # stores change even less often than items
+    cached = utils.cache_get("store_list", 0)
+    if cached:
+        return ORJSONResponse(cached)
+
+    # get all store stores as plain (id, name) rows
+    store_list = session.execute(select(models.Store.id, models.Store.name)).all()
 
+    utils.cache_set(
+        "store_list", 0, [{"id": store.id, "name": store.name} for store in store_list]
+    )
     return store_list
 
 
@@ -362,22 +383,32 @@ def create_transaction(
         price=transaction.price,
     )
 
-    for item in transaction.items:
-        # Update stock amount
-        stockdb = models.Stock(
+    # Update stock amounts in one batch
+    stocks = [
+        models.Stock(
             item_id=item.item_id,
             store_id=transaction.store_id,
             quantity=item.quantity,
             transaction=transactiondb,
-            transaction_id=transactiondb.id,
         )
-        session.add(stockdb)
+        for item in transaction.items
+    ]
+    session.add_all(stocks)
 
     # add it to the session and commit it
     session.add(transactiondb)
     session.commit()
+    # refresh stays: datetime is a DB-side default the response includes
     session.refresh(transactiondb)
-    return read_transaction(transactiondb.id, session)
+
+    # build the response from what we just wrote instead of selecting it back
+    return {
+        "id": transactiondb.id,
+        "store_id": transaction.store_id,
+        "price": transactiondb.price,
+        "items": stocks,
+        "datetime": transactiondb.datetime,
+    }
 
 
 @app.get("/transaction/{id}", response_model=schemas.TransactionShow)
@@ -387,14 +418,14 @@ def read_transaction(
     current_user: schemas.User = Depends(get_current_active_user),
 ):
 
-    # get the transaction with the given id
-    transaction = session.query(models.Transaction).get(id)
-
-    # check if transaction with given id exists. If not, raise exception and return 404 not found response
-    if not transaction:
-        raise HTTPException(
-            status_code=404, detail=f"transaction item with id {id} not found"
-        )
+    # get the transaction with the given id (404s if missing)
+    transaction = utils.get_or_404(
+        session,
+        models.Transaction,
+        id,
+        "transaction item",
+        options=[selectinload(models.Transaction.stocks)],
+    )
 
     response = utils.prettify_transaction(transaction)
     return response
@@ -408,34 +439,37 @@ def update_transaction(
     current_user: schemas.User = Depends(get_current_active_user),
 ):
 
-    # get the transaction with the given id
-    transactiondb = session.query(models.Transaction).get(id)
-
-    # check if transaction with given id exists. If not, raise exception and return 404 not found response
-    if not transactiondb:
-        raise HTTPException(
-            status_code=404, detail=f"transaction with id {id} not found"
-        )
+    # get the transaction with the given id (404s if missing)
+    transactiondb = utils.get_or_404(
+        session,
+        models.Transaction,
+        id,
+        "transaction",
+        options=[selectinload(models.Transaction.stocks)],
+    )
 
     transactiondb.price = transaction.price or transactiondb.price
 
     if transaction.items:
-        for item in transactiondb.stocks:
-            session.delete(item)
-        for item in transaction.items:
-            stockdb = models.Stock(
-                item_id=item.item_id,
-                store_id=transaction.store_id or transactiondb.stock[0].store_id,
-                quantity=item.quantity,
-                transaction=transactiondb,
-                transaction_id=transactiondb.id,
-            )
-            session.add(stockdb)
+        store_id = transaction.store_id or transactiondb.stocks[0].store_id
+        # one bulk DELETE instead of a delete per stock row
+        session.execute(delete(models.Stock).where(models.Stock.transaction_id == id))
+        session.add_all(
+            [
+                models.Stock(
+                    item_id=item.item_id,
+                    store_id=store_id,
+                    quantity=item.quantity,
+                    transaction=transactiondb,
+                )
+                for item in transaction.items
+            ]
+        )
 
     session.commit()
     session.refresh(transactiondb)
 
-    return read_transaction(transactiondb.id, session)
+    return utils.prettify_transaction(transactiondb)
 
 
 @app.delete(
@@ -450,19 +484,14 @@ def delete_transaction(
     Should this method exist??? NO!!!!
     """
 
-    # get the transaction with the given id
-    transaction = session.query(models.Transaction).get(id)
+    # get the transaction with the given id (404s if missing)
+    # no need to load the stocks here, the bulk DELETE below handles them
+    transaction = utils.get_or_404(session, models.Transaction, id, "transaction")
 
-    # if transaction with given id exists, delete it from the database. Otherwise raise 404 error
-    if transaction:
-        for item in transaction.stocks:
-            session.delete(item)
-        session.delete(transaction)
-        session.commit()
-    else:
-        raise HTTPException(
-            status_code=404, detail=f"transaction with id {id} not found"
-        )
+    # one bulk DELETE for the stock rows instead of a per-row loop
+    session.execute(delete(models.Stock).where(models.Stock.transaction_id == id))
+    session.delete(transaction)
+    session.commit()
 
     return None
 
@@ -470,14 +499,12 @@ def delete_transaction(
 @app.get("/transaction", response_model=List[schemas.TransactionShow])
 def read_transaction_custom(
     store_id: Optional[int] = None,
-    start_date: Optional[str] = Query(
-        default=None, regex="^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])$"
-    ),
-    end_date: Optional[str] = Query(
-        default=None, regex="^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])$"
-    ),
+    start_date: Optional[str] = Query(default=None, regex=DATE_REGEX),
+    end_date: Optional[str] = Query(default=None, regex=DATE_REGEX),
     min_price: Optional[int] = None,
     max_price: Optional[int] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
     session: Session = Depends(get_session),
     current_user: schemas.User = Depends(get_current_active_user),
 ):
@@ -489,8 +516,12 @@ def read_transaction_custom(
     end_date:       EXCLUSIVE!
     min_price
     max_price
+    skip/limit:     pagination, capped at 1000 rows per page
     """
-    transaction_list = session.query(models.Transaction)
+    # stocks are loaded eagerly; every other relationship raises if touched
+    transaction_list = session.query(models.Transaction).options(
+        selectinload(models.Transaction.stocks), raiseload("*")
+    )
     if min_price:
         transaction_list = transaction_list.filter(
             models.Transaction.price >= min_price
@@ -508,12 +539,15 @@ def read_transaction_custom(
             models.Transaction.datetime <= end_date
         )
     if store_id:
-        transaction_list = transaction_list.join(
-            models.Stock, models.Transaction.stocks
-        ).filter(models.Stock.store_id == store_id)
+        # EXISTS keeps one row per transaction - joining on stock would
+        # multiply rows per stock line and make offset/limit count
+        # those instead of transactions
+        transaction_list = transaction_list.filter(
+            models.Transaction.stocks.any(models.Stock.store_id == store_id)
+        )
+    transaction_list = transaction_list.offset(skip).limit(limit)
     response = [
-        utils.prettify_transaction(transaction)
-        for transaction in transaction_list.all()
+        utils.prettify_transaction(transaction) for transaction in transaction_list
     ]
     return response
 
@@ -527,39 +561,57 @@ def create_total(
     """
     Takes in a CSV of totals.
     """
-    csvReader = csv.DictReader(codecs.iterdecode(file.file, "utf-8"))
+    csvReader = csv.DictReader(
+        io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    )
+    rows = []
     for row in csvReader:
         date = row["date"]
-        card = float(row["card"] or 0)
-        cash = float(row["cash"] or 0)
-        total = float(row.get("total") or 0)
+        # Decimal keeps the pennies exact; math.ceil still rounds any
+        # stray sub-penny amounts up like the old float path did
+        card = Decimal(row["card"] or 0)
+        cash = Decimal(row["cash"] or 0)
+        total = Decimal(row.get("total") or 0)
         store_id = int(row["store_id"])
         transaction_count = int(row["transaction_count"]) or 0
 
-        date = datetime.strptime(date, "%d/%m/%y")
-        cash = int(math.ceil(cash * 100))
-        card = int(math.ceil(card * 100))
-        total = int(math.ceil(total * 100)) if total else cash + card
+        # hand-rolled %d/%m/%y parse - strptime re-reads the format string
+        # on every call, which dominates the row loop on big uploads.
+        # Same two-digit-year pivot as strptime (00-68 -> 2000s).
+        day, month, year = date.split("/")
+        year = int(year)
+        date = datetime(year + (2000 if year < 69 else 1900), int(month), int(day))
+        cash = math.ceil(cash * 100)
+        card = math.ceil(card * 100)
+        total = math.ceil(total * 100) if total else cash + card
         if total != cash + card:
             raise HTTPException(
                 status_code=404,
                 detail=f"total does not equal cash and card for date {date}, store_id {store_id}, cash {cash}, card {card}, total {total}",
             )
 
-        # create an instance of the Store database model
-        totaldb = models.Total(
-            date=date,
-            card=card,
-            cash=cash,
-            total=total,
-            store_id=store_id,
-            transaction_count=transaction_count,
+        rows.append(
+            {
+                "date": date,
+                "card": card,
+                "cash": cash,
+                "total": total,
+                "store_id": store_id,
+                "transaction_count": transaction_count,
+            }
         )
-        # add it to the session and commit it
-        session.add(totaldb)
 
+        # flush a chunk at a time so a huge upload neither buffers every
+        # row in memory nor holds one giant write transaction
+        if len(rows) >= 1000:
+            session.execute(insert(models.Total), rows)
+            session.commit()
+            rows.clear()
+
+    # final partial chunk
+    if rows:
+        session.execute(insert(models.Total), rows)
     session.commit()
-    # session.refresh(totaldb)
 
     # return the store object
     return {"status": "done"}
@@ -574,22 +626,27 @@ def create_total(
     """
     TODO: FIX THIS. ADD CSV SUPPORT. FIX THE SHITTY BROKEN SYSTEM I HAVE NOW. FUCK THIS SO MUCH.
     """
-    cash = int(math.ceil(total.cash * 100))
-    card = int(math.ceil(total.card * 100))
-    total_input = int(math.ceil(total.total * 100))
+    # exact integer pennies - the schema guarantees 2dp decimals
+    cash = int(total.cash * 100)
+    card = int(total.card * 100)
+    total_input = int(total.total * 100)
     if total_input != cash + card:
         raise HTTPException(
             status_code=404, detail=f"total does not equal cash and card"
         )
 
-    # Check if total already exists
-    total_day = read_total_custom(
-        total.store_id,
-        start_date=str(total.date),
-        end_date=str(total.date + timedelta(days=1)),
-        session=session,
+    # Check if total already exists - one indexed SELECT 1 instead of
+    # materializing the day's rows through read_total_custom
+    exists_stmt = (
+        select(literal(1))
+        .where(
+            models.Total.store_id == total.store_id,
+            models.Total.date >= str(total.date),
+            models.Total.date < str(total.date + timedelta(days=1)),
+        )
+        .limit(1)
     )
-    if len(total_day) > 0:
+    if session.execute(exists_stmt).first():
         raise HTTPException(status_code=404, detail=f"Total already exists!")
 
     # create an instance of the Store database model
@@ -605,7 +662,6 @@ def create_total(
     # add it to the session and commit it
     session.add(totaldb)
     session.commit()
-    session.refresh(totaldb)
 
     # return the store object
     return totaldb
@@ -618,14 +674,8 @@ def read_total(
     current_user: schemas.User = Depends(get_current_active_user),
 ):
 
-    # get the store with the given id
-    total = session.query(models.Total).get(id)
-
-    # check if store with given id exists. If not, raise exception and return 404 not found response
-    if not total:
-        raise HTTPException(
-            status_code=404, detail=f"total item with id {id} not found"
-        )
+    # get the total with the given id (404s if missing)
+    total = utils.get_or_404(session, models.Total, id, "total item")
 
     return total
 
@@ -641,10 +691,9 @@ def update_total(
     current_user: schemas.User = Depends(get_current_active_user),
 ):
 
-    # get the store with the given id
-    total = session.query(models.Total).get(id)
+    # get the total with the given id (404s if missing, and before we touch it)
+    total = utils.get_or_404(session, models.Total, id, "total")
 
-    # update store with the given name (if a store with the given id was found)
     total.cash = int(math.ceil(cash * 100)) if cash else total.cash
     total.card = int(math.ceil(card * 100)) if card else total.card
     total.total = total.cash + total.card
@@ -657,10 +706,6 @@ def update_total(
 
     session.commit()
 
-    # check if total with given id exists. If not, raise exception and return 404 not found response
-    if not total:
-        raise HTTPException(status_code=404, detail=f"total with id {id} not found")
-
     return total
 
 
@@ -674,15 +719,10 @@ def delete_total(
     Should this method exist???
     """
 
-    # get the store with the given id
-    total = session.query(models.Total).get(id)
-
-    # if total with given id exists, delete it from the database. Otherwise raise 404 error
-    if total:
-        session.delete(total)
-        session.commit()
-    else:
-        raise HTTPException(status_code=404, detail=f"total with id {id} not found")
+    # get the total with the given id (404s if missing), then delete it
+    total = utils.get_or_404(session, models.Total, id, "total")
+    session.delete(total)
+    session.commit()
 
     return None
 
@@ -702,120 +742,75 @@ def delete_total(
 @app.get("/total", response_model=List[schemas.Total])
 def read_total_custom(
     store_id: Optional[int] = None,
-    start_date: Optional[str] = Query(
-        default=None, regex="^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])$"
-    ),
-    end_date: Optional[str] = Query(
-        default=None, regex="^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])$"
-    ),
+    start_date: Optional[str] = Query(default=None, regex=DATE_REGEX),
+    end_date: Optional[str] = Query(default=None, regex=DATE_REGEX),
     week: Optional[bool] = False,
     ascending: Optional[bool] = False,
     session: Session = Depends(get_session),
     current_user: schemas.User = Depends(get_current_active_user),
 ):
     """
-    This is going to be one BIG BIG DIRTY method for dealing with all custom ranges.
     Can filter through a range of query parameters
-    store_id:
+    store_id:       -1 sums every store together
     start_date:     INCLUSIVE!
     end_date:       EXCLUSIVE!
-    min_price
-    max_price
+    week:           roll totals up into weekly buckets
     """
 
-    def store_grouper(item):
-        store_id = item.store_id
-        return store_id
-
-    def day_grouper(item):
-        return str(item.date.date())
+    aggregate = week or store_id == -1
 
-    def week_grouper(item):
-        item_date = item.date.date()
-        week = item_date.isocalendar().week
-        return week
+    if not aggregate:
+        total_list = session.query(models.Total)
+        if start_date:
+            total_list = total_list.filter(models.Total.date >= start_date)
+        if end_date:
+            total_list = total_list.filter(models.Total.date <= end_date)
+        if store_id:
+            total_list = total_list.filter(models.Total.store_id == store_id)
 
-    def month_grouper(item):
-        item_date = item.date.date()
-        month = item_date.isocalendar().month
-        return month
-
-    total_list = session.query(models.Total)
-    if start_date:
-        total_list = total_list.filter(models.Total.date >= start_date)
-    if end_date:
-        total_list = total_list.filter(models.Total.date <= end_date)
-    if store_id and store_id != -1:
-        total_list = total_list.filter(models.Total.store_id == store_id)
+        # direction goes into the SQL so the date index serves either scan
+        order = models.Total.date.asc() if ascending else models.Total.date.desc()
+        return total_list.order_by(order).all()
 
-    result = total_list.order_by(models.Total.date).all()
+    # Aggregate in SQL: one row per group comes back instead of every
+    # Total row being shipped out and accumulated in Python.
+    # Weekly buckets use %Y-%W so weeks can't merge across years.
+    if week:
+        period = func.strftime("%Y-%W", models.Total.date)
+    else:
+        period = func.strftime("%Y-%m-%d", models.Total.date)
+
+    columns = [
+        func.min(models.Total.id).label("id"),
+        func.min(models.Total.date).label("date"),
+        func.sum(models.Total.card).label("card"),
+        func.sum(models.Total.cash).label("cash"),
+        (func.sum(models.Total.card) + func.sum(models.Total.cash)).label("total"),
+        func.sum(models.Total.transaction_count).label("transaction_count"),
+    ]
 
     if store_id == -1:
         # we want to sum all the stores together
-        final_result = []
-        for (_date, sub_items) in groupby(result, day_grouper):
-            total = 0
-            card_total = 0
-            cash_total = 0
-            transaction_total = 0
-            starting_date = None
-            tran_id = None
-            for item in sub_items:
-                tran_id = tran_id or item.id
-                starting_date = starting_date or item.date
-                card_total += item.card
-                cash_total += item.cash
-                transaction_total += item.transaction_count
-            total += cash_total + card_total
-            final_result.append(
-                {
-                    "id": tran_id,
-                    "store_id": -1,
-                    "date": starting_date,
-                    "total": total,
-                    "card": card_total,
-                    "cash": cash_total,
-                    "transaction_count": transaction_total,
-                }
-            )
-        result = final_result
-
-    if week:
-        # Groups by week.
-        # If store_id not given, collates all stores result.
-        final_result = []
-        for (week, items) in groupby(result, week_grouper):
-            sorted_items = sorted(items, key=lambda item: item.store_id)
-            for (_store_id, sub_items) in groupby(sorted_items, store_grouper):
-                total = 0
-                card_total = 0
-                cash_total = 0
-                transaction_total = 0
-                starting_date = None
-                tran_id = None
-                store_id = None
-                for item in sub_items:
-                    tran_id = tran_id or item.id
-                    starting_date = starting_date or item.date
-                    card_total += item.card
-                    cash_total += item.cash
-                    transaction_total += item.transaction_count
-                    store_id = store_id or item.store_id
-                total += cash_total + card_total
-                final_result.append(
-                    {
-                        "id": tran_id,
-                        "store_id": store_id or -1,
-                        "date": starting_date,
-                        "total": total,
-                        "card": card_total,
-                        "cash": cash_total,
-                        "transaction_count": transaction_total,
-                    }
-                )
-        result = final_result
+        stmt = select(*columns).group_by(period)
+    else:
+        stmt = select(models.Total.store_id, *columns).group_by(
+            period, models.Total.store_id
+        )
 
-    if not ascending:
-        result.reverse()
+    if start_date:
+        stmt = stmt.where(models.Total.date >= start_date)
+    if end_date:
+        stmt = stmt.where(models.Total.date <= end_date)
+    if store_id and store_id != -1:
+        stmt = stmt.where(models.Total.store_id == store_id)
+    order = func.min(models.Total.date)
+    stmt = stmt.order_by(order.asc() if ascending else order.desc())
+
+    result = []
+    for row in session.execute(stmt):
+        entry = dict(row._mapping)
+        if store_id == -1:
+            entry["store_id"] = -1
+        result.append(entry)
 
     return result
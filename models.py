@@ -1,5 +1,14 @@
 from enum import unique
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, ForeignKey, func
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    String,
+    ForeignKey,
+    func,
+)
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -13,8 +22,6 @@ class Item(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(256))
 
-    stocks = relationship("Stock", back_populates="item")
-
 
 # Define Store class inheriting from Base
 # This stores information on the store itself
@@ -24,9 +31,6 @@ class Store(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(256))
 
-    stocks = relationship("Stock", back_populates="store")
-    totals = relationship("Total", back_populates="store")
-
 
 # Define Transaction class inheriting from Base
 # This stores information on the transaction itself
@@ -37,12 +41,22 @@ class Store(Base):
 #       This is done by having many-to-one stock->transaction
 class Transaction(Base):
     __tablename__ = "transaction"
+    # Covers the date/price range filters in the custom transaction query.
+    __table_args__ = (Index("ix_transaction_datetime_price", "datetime", "price"),)
     id = Column(Integer, primary_key=True)
+    # datetime range scans are covered by the composite index prefix above
     datetime = Column(DateTime(timezone=True), server_default=func.now())
-    price = Column(Integer)
+    price = Column(Integer, index=True)
 
     # One to Many
-    stocks = relationship("Stock", back_populates="transaction")
+    # passive_deletes stops the ORM re-emitting per-row deletes after the
+    # bulk DELETE the endpoints already issue.
+    stocks = relationship(
+        "Stock",
+        back_populates="transaction",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
 
 
 # Define Stock class inheriting from Base
@@ -53,16 +67,21 @@ class Transaction(Base):
 # Transactions are tied to stock change
 class Stock(Base):
     __tablename__ = "stock"
+    # Covers the transaction.stocks load by prefix and lets per-store /
+    # per-item rollups over a transaction's rows run index-only.
+    __table_args__ = (
+        Index("ix_stock_txn_store_item", "transaction_id", "store_id", "item_id"),
+    )
     id = Column(Integer, primary_key=True)
     item_id = Column(Integer, ForeignKey("item.id"))
-    store_id = Column(Integer, ForeignKey("store.id"))
+    store_id = Column(Integer, ForeignKey("store.id"), index=True)
     transaction_id = Column(Integer, ForeignKey("transaction.id"))
     quantity = Column(Integer)
 
-    item = relationship("Item", back_populates="stocks")
-    store = relationship("Store", back_populates="stocks")
     # NOTE SINGULAR, NOT PLURAL
     # Many to One
+    # The only relationship pair anything traverses - the item/store
+    # sides were never read, so they aren't mapped.
     transaction = relationship("Transaction", back_populates="stocks")
 
 
@@ -78,12 +97,13 @@ class User(Base):
 
 class Total(Base):
     __tablename__ = "total"
+    # Backs the per-store day lookups (duplicate check, custom ranges).
+    # Not unique because /total/batch has no duplicate guard.
+    __table_args__ = (Index("ix_total_store_date", "store_id", "date"),)
     id = Column(Integer, primary_key=True, autoincrement=True)
-    date = Column(DateTime(timezone=True))
+    date = Column(DateTime(timezone=True), index=True)
     card = Column(Integer, nullable=False)
     cash = Column(Integer, nullable=False)
     total = Column(Integer, nullable=False)
     store_id = Column(Integer, ForeignKey("store.id"), nullable=False)
     transaction_count = Column(Integer, nullable=False)
-
-    store = relationship("Store", back_populates="totals")
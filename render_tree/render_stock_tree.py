@@ -1,47 +1,51 @@
-from functools import partial
-
+import orjson
 from anytree import AnyNode, RenderTree
-from anytree.search import findall
-from anytree.exporter.jsonexporter import JsonExporter
 
 from test_data import sample_data
 
 
-def filter_func(path, the_node):
-    rendered_path = "/".join([""] + [str(node.name) for node in the_node.path])
-    return path == rendered_path
+def add_nodes(index, root, item):
+    # Walk the category path one level at a time, looking each step up in
+    # the dict index - O(depth) per item instead of findall scanning the
+    # whole tree (and re-joining every node's path) per level.
+    key = ("stock",)
+    node = root
+    for sub_cat in item["category"].split("/"):
+        key += (sub_cat,)
+        existing = index.get(key)
+        if existing:
+            existing.ids += [item["id"]]
+            node = existing
+        else:
+            node = AnyNode(name=sub_cat, parent=node, ids=[item["id"]])
+            index[key] = node
 
 
-def path_exist(root, path):
-    filter_wrapper = partial(filter_func, path)
-    return findall(root, filter_=filter_wrapper)
+def to_dict(node):
+    # Plain nested dicts for orjson - same shape JsonExporter produced.
+    data = {"name": node.name, "ids": node.ids}
+    if node.children:
+        data["children"] = [to_dict(child) for child in node.children]
+    return data
 
 
-def add_nodes(root, item, current_path):
-    sub_cats = item["category"].split("/")
-    # print(sub_cats)
-    new_current_path = current_path
-    newest_node = None
-    for sub_cat in sub_cats:
-        new_current_path += f"/{sub_cat}"
-        exists = path_exist(root, new_current_path)
-        if exists:
-            exists[0].ids += [item["id"]]
-            newest_node = exists[0]
-        else:
-            newest_node = AnyNode(
-                name=sub_cat, parent=newest_node or root, ids=[item["id"]]
-            )
+def build_tree(items):
+    root = AnyNode(name="stock", ids=[-1])
+    index = {}
+    for item in items:
+        add_nodes(index, root, item)
+    return root
 
 
-root = AnyNode(name="stock", ids=[-1])
-for item in sample_data:
-    add_nodes(root, item, current_path="/stock")
-# print(sample_data)
+if __name__ == "__main__":
+    root = build_tree(sample_data)
 
-for pre, fill, node in RenderTree(root):
-    print("%s%s" % (pre, node.name))
+    for pre, fill, node in RenderTree(root):
+        print("%s%s" % (pre, node.name))
 
-exporter = JsonExporter(indent=2, sort_keys=True)
-with open("output.json", "w") as f:
-    f.write(exporter.export(root))
+    with open("output.json", "wb") as f:
+        f.write(
+            orjson.dumps(
+                to_dict(root), option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+            )
+        )
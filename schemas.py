@@ -1,6 +1,6 @@
 import datetime
 
-from pydantic import BaseModel
+from pydantic import BaseModel, condecimal
 from typing import List, Optional, Union
 
 # Create Item Schema (Pydantic Model)
@@ -121,10 +121,12 @@ class TotalShow(BaseModel):
 
 
 class TotalCreate(BaseModel):
+    # Money comes in as exact 2dp decimals, never floats, so converting
+    # to integer pennies is lossless and the cash+card check is exact.
     date: datetime.date
-    card: float
-    cash: float
-    total: float
+    card: condecimal(decimal_places=2)
+    cash: condecimal(decimal_places=2)
+    total: condecimal(decimal_places=2)
     store_id: int
     transaction_count: int
 
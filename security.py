@@ -2,12 +2,14 @@ from datetime import datetime, timedelta
 from typing import Union
 import os
 import logging
+import time
 
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from database import get_session
@@ -40,7 +42,9 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 12
 
 
 def get_user(session, username: str):
-    user = session.query(models.User).filter(models.User.username == username).first()
+    user = session.scalars(
+        select(models.User).where(models.User.username == username)
+    ).first()
 
     if user:
         return schemas.User(
@@ -51,7 +55,13 @@ def get_user(session, username: str):
         )
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost is tunable so a loaded box can trade hash time against
+# worker-thread blocking. 12 is the passlib default.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=int(os.getenv("BCRYPT_ROUNDS", 12)),
+)
 
 
 def verify_password(plain_password, hashed_password):
@@ -70,19 +80,43 @@ def authenticate_user(user: schemas.UserInDB, password: str):
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
+    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return {"access_token": encoded_jwt, "token_type": "bearer", "expiry": expire}
 
 
+# Cache of bearer token -> (user, expiry timestamp).
+# Every authenticated endpoint hits get_current_user, so this saves a JWT
+# decode plus a user table query per request. Entries die with the token.
+_user_cache = {}
+_USER_CACHE_MAX = 1024
+
+
+def _prune_user_cache(now: float):
+    if len(_user_cache) < _USER_CACHE_MAX:
+        return
+    for cached_token, (_user, expiry) in list(_user_cache.items()):
+        if expiry <= now:
+            del _user_cache[cached_token]
+    # Every /token call mints a fresh 12-hour token, so the cache can
+    # fill with live entries too. Evict the soonest-to-expire ones so
+    # the constant is an actual cap.
+    if len(_user_cache) >= _USER_CACHE_MAX:
+        overflow = len(_user_cache) - _USER_CACHE_MAX + 1
+        for cached_token in sorted(_user_cache, key=lambda t: _user_cache[t][1])[
+            :overflow
+        ]:
+            del _user_cache[cached_token]
+
+
 def get_current_user(
     token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)
 ):
-    start = datetime.now()
+    now = time.time()
+    cached = _user_cache.get(token)
+    if cached and cached[1] > now:
+        return cached[0]
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -93,14 +127,13 @@ def get_current_user(
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-        token_data = schemas.TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = get_user(session, username=token_data.username)
+    user = get_user(session, username=username)
     if user is None:
         raise credentials_exception
-    end = datetime.now()
-    # print(end - start)
+    _user_cache[token] = (user, payload.get("exp", now + 60))
+    _prune_user_cache(now)
     return user
 
 
@@ -128,3 +161,12 @@ def check_superuser(user: schemas.User):
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="You are unauthorised to create a new user.",
         )
+
+
+def get_current_superuser(
+    current_user: schemas.User = Depends(get_current_active_user),
+):
+    # Dependency form of check_superuser, so endpoints declare one dep
+    # instead of resolving the user and then checking in the body.
+    check_superuser(current_user)
+    return current_user
@@ -1,9 +1,53 @@
 # Things that don't really fit anywhere else.
 # The beginning of the end of conciseness.
+import time
+
+from fastapi import HTTPException
+
 import models
 import schemas
 
 
+def get_or_404(session, model, id: int, name: str, options=None):
+    # One PK SELECT and one null-check, shared by every read/update/delete
+    # endpoint. `name` keeps each endpoint's historical error wording.
+    obj = session.get(model, id, options=options)
+    if not obj:
+        raise HTTPException(status_code=404, detail=f"{name} with id {id} not found")
+    return obj
+
+
+# Tiny in-process cache for the hot single-row GETs (item/store).
+# Keyed on (kind, id). Entries expire after CACHE_TTL seconds; the
+# mutating endpoints drop their own entry eagerly, other workers just
+# wait out the TTL.
+CACHE_TTL = 60
+_CACHE_MAX = 500
+_cache = {}
+
+
+def cache_get(kind: str, id: int):
+    entry = _cache.get((kind, id))
+    if not entry:
+        return None
+    value, expiry = entry
+    if expiry < time.time():
+        del _cache[(kind, id)]
+        return None
+    return value
+
+
+def cache_set(kind: str, id: int, value):
+    # Cheap and cheerful size cap. Hot entries repopulate immediately.
+    if len(_cache) >= _CACHE_MAX:
+        _cache.clear()
+    _cache[(kind, id)] = (value, time.time() + CACHE_TTL)
+
+
+def cache_drop(kind: str, id: int):
+    _cache.pop((kind, id), None)
+
+
 def prettify_transaction(transaction: models.Transaction) -> schemas.TransactionShow:
     return {
         "id": transaction.id,